@@ -3,7 +3,7 @@ from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
 from typing import List
-from c.tools.github_tools import get_github_repos_tool, clone_github_repo_tool, get_repo_info_tool
+from c.tools.github_tools import get_github_repos_tool, clone_github_repo_tool, clone_github_repos_tool, get_repo_info_tool
 from c.tools.dependency_tools import extract_project_dependencies
 import os
 from c.tools.analyze_python_ast import generate_ast_usage_pdf
@@ -26,7 +26,7 @@ class Automation():
     def github_manager(self) -> Agent:
         return Agent(
             config=self.agents_config['github_manager'], # type: ignore[index]
-            tools=[get_github_repos_tool, clone_github_repo_tool, get_repo_info_tool],
+            tools=[get_github_repos_tool, clone_github_repo_tool, clone_github_repos_tool, get_repo_info_tool],
             verbose=True
         )
     
@@ -73,6 +73,12 @@ class Automation():
             config=self.tasks_config['extract_imports_task'],
             agent=self.python_ast_parser()
         )
+    @task
+    def summarize_analysis_task(self) -> Task:
+        return Task(
+            config=self.tasks_config['summarize_analysis_task'],
+            agent=self.python_ast_parser()
+        )
 
     @crew
     def crew(self) -> Crew:
@@ -85,8 +91,11 @@ class Automation():
         else:
             tasks.append(self.clone_repositories_task())
 
+        # Both extraction tasks only read the cloned tree, so they run concurrently (async_execution
+        # in tasks.yaml) and the summary task joins them.
         tasks.append(self.extract_dependencies_task())
         tasks.append(self.extract_imports_task())
+        tasks.append(self.summarize_analysis_task())
 
         return Crew(
             agents=[self.github_manager(), self.dependency_agent(),self.python_ast_parser()],
@@ -1,199 +1,444 @@
 import ast
+import functools
+import hashlib
+import io
+import multiprocessing
 import os
-import pandas as pd
+import pickle
+import re
+import sys
+import threading
+import time
+import tokenize
 import importlib.metadata
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor
 from fpdf import FPDF
+from fpdf.enums import XPos, YPos
 from crewai.tools import tool
+from c.tools.project_scan import scan_project
+
+# Bump whenever ImportUsageVisitor's output changes so stale cache entries are ignored.
+SCHEMA_VERSION = 7
+AST_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "c-ast")
+# Entries not read or written for this many seconds are pruned (default 30 days).
+AST_CACHE_MAX_AGE = int(os.getenv("AST_CACHE_MAX_AGE", 30 * 24 * 3600))
+# prune_ast_cache scans the cache directory at most this often (default once a day).
+AST_CACHE_PRUNE_INTERVAL = int(os.getenv("AST_CACHE_PRUNE_INTERVAL", 24 * 3600))
+_PRUNE_MARKER = ".last-prune"
+# The line breaks the tokenizer recognises, so SourceLines numbers lines the same way ast does.
+_LINE_BREAK_PATTERN = re.compile(rb"\r\n?|\n")
+_CACHE_ENTRY_PATTERN = re.compile(r"-py\d+-v(\d+)\.pkl$")
+# Below this many files, parsing in-process is cheaper than starting a process pool.
+MIN_PARALLEL_FILES = 16
+
+# In-flight shared_ast_cache builds, keyed by the set of files being parsed.
+_AST_CACHE_LOCK = threading.Lock()
+_AST_CACHE_BUILDS = {}
+
+class SourceLines:
+    """
+    Line lookup over raw source bytes.
+
+    Only line start offsets are indexed up front, breaking on \\r\\n, \\r and \\n like the tokenizer; a line
+    is sliced and decoded the first time the visitor asks for it, so the source is never split into one
+    string per line.
+    """
+
+    def __init__(self, source_bytes, encoding="utf-8"):
+        self.source = source_bytes
+        self.encoding = encoding
+        self._line_starts = None
+        self._decoded = {}
+
+    def _starts(self):
+        if self._line_starts is None:
+            starts = array("Q", [0])
+            starts.extend(match.end() for match in _LINE_BREAK_PATTERN.finditer(self.source))
+            self._line_starts = starts
+        return self._line_starts
+
+    def __getitem__(self, index):
+        line = self._decoded.get(index)
+        if line is None:
+            starts = self._starts()
+            if not 0 <= index < len(starts):
+                return ""
+            end = starts[index + 1] if index + 1 < len(starts) else len(self.source)
+            # A line can't contain a break character, so stripping them only removes its own terminator.
+            line = self.source[starts[index]:end].rstrip(b"\r\n").decode(self.encoding, errors="replace")
+            self._decoded[index] = line
+        return line
+
+class ImportRecord(NamedTuple):
+    module: str
+    alias: str
+    level: int
+    lineno: int
+    code: str
+
+# Usage records stay plain (root, full_name, lineno, code) tuples: they are by far the most numerous.
 
 class ImportUsageVisitor(ast.NodeVisitor):
-    def __init__(self, source_lines, filename):
+    def __init__(self, source_lines: SourceLines, filename: str) -> None:
         self.source_lines = source_lines
         self.current_file = filename
-        self.imports = []
-        self.usage = []
+        self.imports: List[ImportRecord] = []
+        self.usage: List[Tuple[str, str, int, str]] = []
+        self._dispatch: Dict[type, Callable[[ast.AST], None]] = {}
+
+    def visit(self, node: ast.AST) -> None:
+        # Same lookup as NodeVisitor.visit, but resolved once per node type instead of per node.
+        node_type = type(node)
+        visitor = self._dispatch.get(node_type)
+        if visitor is None:
+            visitor = getattr(self, f"visit_{node_type.__name__}", self.generic_visit)
+            self._dispatch[node_type] = visitor
+        visitor(node)
 
-    def visit_Import(self, node):
+    def generic_visit(self, node: ast.AST) -> None:
+        visit = self.visit
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        visit(item)
+            elif isinstance(value, ast.AST):
+                visit(value)
+
+    def visit_Import(self, node: ast.Import) -> None:
         for alias in node.names:
             code_line = self.source_lines[node.lineno - 1]
-            self.imports.append({
-                "module": alias.name,
-                "alias": alias.asname or alias.name,
-                "lineno": node.lineno,
-                "code": code_line
-            })
+            self.imports.append(ImportRecord(alias.name, alias.asname or alias.name, 0, node.lineno, code_line))
         self.generic_visit(node)
 
-    def visit_ImportFrom(self, node):
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
         module = node.module
         for alias in node.names:
             full_name = f"{module}.{alias.name}"
             code_line = self.source_lines[node.lineno - 1]
-            self.imports.append({
-                "module": full_name,
-                "alias": alias.asname or alias.name,
-                "lineno": node.lineno,
-                "code": code_line
-            })
+            self.imports.append(ImportRecord(full_name, alias.asname or alias.name, node.level, node.lineno, code_line))
         self.generic_visit(node)
 
-    def visit_Call(self, node):
+    def visit_Call(self, node: ast.Call) -> None:
         full_name = self.get_full_attribute_name(node.func)
         if full_name:
             line = node.lineno
             code_line = self.source_lines[line - 1]
-            self.usage.append((full_name, line, code_line))
+            self.usage.append((full_name.split('.', 1)[0], full_name, line, code_line))
         self.generic_visit(node)
 
-    def visit_Attribute(self, node):
-        current = node
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        parts = []
+        current: ast.expr = node
         while isinstance(current, ast.Attribute):
+            parts.append(current.attr)
             current = current.value
         if isinstance(current, ast.Name):
-            full_name = self.get_full_attribute_name(node)
+            parts.append(current.id)
+            parts.reverse()
             line = node.lineno
             code_line = self.source_lines[line - 1]
-            self.usage.append((full_name, line, code_line))
+            self.usage.append((parts[0], ".".join(parts), line, code_line))
         self.generic_visit(node)
 
-    def get_full_attribute_name(self, node):
-        if isinstance(node, ast.Name):
-            return node.id
-        elif isinstance(node, ast.Attribute):
-            return f"{self.get_full_attribute_name(node.value)}.{node.attr}"
-        return ""
+    def get_full_attribute_name(self, node: ast.expr) -> str:
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        # A chain rooted in anything but a name (a call, a subscript...) keeps an empty root, e.g. ".attr".
+        parts.append(node.id if isinstance(node, ast.Name) else "")
+        parts.reverse()
+        return ".".join(parts)
 
-def analyze_repo(repo_path):
-    results = []
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            if file.endswith(".py"):
-                file_path = os.path.normpath(os.path.join(root, file))
+def _cache_path(source_bytes):
+    digest = hashlib.sha256(source_bytes).hexdigest()
+    key = f"{digest}-py{sys.version_info[0]}{sys.version_info[1]}-v{SCHEMA_VERSION}"
+    return os.path.join(AST_CACHE_DIR, f"{key}.pkl")
+
+def _read_cache(cache_file):
+    """Return the cached (imports, usage) entry, or None on a miss; unreadable or malformed entries are deleted."""
+    try:
+        with open(cache_file, "rb") as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Truncated pickle, or one naming a class that has since moved: fall through and drop it.
+        entry = None
+    if not (isinstance(entry, tuple) and len(entry) == 2 and all(isinstance(part, list) for part in entry)):
+        try:
+            os.remove(cache_file)
+        except OSError:
+            pass
+        return None
+    # Touch the entry so prune_ast_cache ages out only what is no longer used; a read-only cache still hits.
+    try:
+        os.utime(cache_file)
+    except OSError:
+        pass
+    return entry
+
+def _parse_and_visit(file_path):
+    """Return the visitor's (imports, usage) for a file, reusing the on-disk cache when the source is unchanged."""
+    source_bytes = Path(file_path).read_bytes()
+
+    cache_file = _cache_path(source_bytes)
+    entry = _read_cache(cache_file)
+    if entry is not None:
+        return entry
+
+    # ast.parse decodes bytes itself (honouring any PEP 263 coding cookie); the same encoding is
+    # used for the handful of lines the visitor pulls out as code text.
+    tree = ast.parse(source_bytes, filename=file_path)
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(source_bytes).readline)
+    source_lines = SourceLines(source_bytes, encoding)
+    visitor = ImportUsageVisitor(source_lines, filename=file_path)
+    visitor.visit(tree)
+    entry = (visitor.imports, visitor.usage)
+
+    # Write to a temp file first so concurrent workers never see a partial pickle.
+    try:
+        os.makedirs(AST_CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"[!] Could not write AST cache for {file_path}: {e}")
+    return entry
+
+def _group_usages(file_path, entry):
+    """Turn one file's cache entry into report records: one per import, with its usages attached."""
+    if isinstance(entry, str):
+        return [{
+            "file": file_path,
+            "error": entry
+        }]
+
+    imports, usage_records = entry
+    import_map = {imp.alias: imp for imp in imports}
+    usage_map = defaultdict(list)
+
+    for root_name, usage, line, code in usage_records:
+        if root_name in import_map:
+            usage_map[root_name].append({
+                "symbol": usage,
+                "lineno": line,
+                "code": code
+            })
+
+    return [
+        {
+            "file": file_path,
+            "import": {
+                "symbol": imp.module,
+                "alias": alias,
+                "lineno": imp.lineno,
+                "code": imp.code
+            },
+            "usages": usage_map[alias]
+        }
+        for alias, imp in import_map.items()
+    ]
+
+def _parse_or_error(file_path):
+    try:
+        return file_path, _parse_and_visit(file_path)
+    except Exception as e:
+        print(f"[!] Could not parse {file_path}: {e}")
+        return file_path, str(e)
+
+def _pool_context():
+    # Never fork the caller: the crew runs tools on worker threads, and forking a threaded process can deadlock.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Import this module (and fpdf/crewai with it) once in the server instead of in every worker.
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+def _map_files(func, paths):
+    """Apply func to every path, in a process pool when there are enough files to pay for one."""
+    # ProcessPoolExecutor rejects more than 61 workers on Windows.
+    max_workers = min(os.cpu_count() or 1, len(paths), 61)
+    if len(paths) < MIN_PARALLEL_FILES or max_workers <= 1:
+        return [func(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_pool_context()) as executor:
+        return list(executor.map(func, paths, chunksize=32))
+
+def prune_ast_cache(max_age=AST_CACHE_MAX_AGE, interval=AST_CACHE_PRUNE_INTERVAL):
+    """
+    Delete on-disk AST cache entries written for another SCHEMA_VERSION, or unused for max_age seconds.
+
+    Leftover temp files from interrupted writes age out the same way. The scan runs at most once per
+    interval, tracked by the mtime of a marker file, so ordinary builds pay a single stat.
+    """
+    marker = os.path.join(AST_CACHE_DIR, _PRUNE_MARKER)
+    now = time.time()
+    try:
+        if os.stat(marker).st_mtime > now - interval:
+            return
+    except OSError:
+        pass
+
+    cutoff = now - max_age
+    try:
+        with os.scandir(AST_CACHE_DIR) as entries:
+            for entry in entries:
+                if entry.name == _PRUNE_MARKER:
+                    continue
+                match = _CACHE_ENTRY_PATTERN.search(entry.name)
                 try:
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            source = f.read()
-                    except UnicodeDecodeError:
-                        print(f"[!] Encoding issue in {file_path}, using fallback decoder.")
-                        with open(file_path, "r", encoding="latin-1", errors="replace") as f:
-                            source = f.read()
-
-                    source_lines = source.splitlines()
-                    tree = ast.parse(source, filename=file_path)
-                    visitor = ImportUsageVisitor(source_lines, filename=file_path)
-                    visitor.visit(tree)
-
-                    import_map = {imp['alias']: imp for imp in visitor.imports}
-                    usage_map = {alias: [] for alias in import_map}
-
-                    for usage, line, code in visitor.usage:
-                        root_name = usage.split('.')[0]
-                        if root_name in usage_map:
-                            usage_map[root_name].append({
-                                "symbol": usage,
-                                "lineno": line,
-                                "code": code
-                            })
-
-                    for alias, imp in import_map.items():
-                        results.append({
-                            "file": file_path,
-                            "type": "import",
-                            "symbol": imp["module"],
-                            "alias": alias,
-                            "lineno": imp["lineno"],
-                            "code": imp["code"]
-                        })
-                        for usage in usage_map[alias]:
-                            results.append({
-                                "file": file_path,
-                                "type": "usage",
-                                "symbol": usage["symbol"],
-                                "alias": alias,
-                                "lineno": usage["lineno"],
-                                "code": usage["code"]
-                            })
-                except Exception as e:
-                    results.append({
-                        "file": file_path,
-                        "type": "error",
-                        "symbol": str(e),
-                        "alias": "",
-                        "lineno": -1,
-                        "code": ""
-                    })
+                    if (match and int(match.group(1)) != SCHEMA_VERSION) or entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+        with open(marker, "wb"):
+            pass
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"[!] Could not prune AST cache: {e}")
+
+def build_ast_cache(paths):
+    """Map each path to its visitor (imports, usage), or to the error message if the file could not be parsed."""
+    prune_ast_cache()
+    # Cache hits are cheap to load here; only the misses are worth shipping to worker processes.
+    results = dict.fromkeys(paths)
+    misses = []
+    for path in paths:
+        try:
+            entry = _read_cache(_cache_path(Path(path).read_bytes()))
+        except OSError:
+            entry = None  # _parse_or_error reports it
+        if entry is None:
+            misses.append(path)
+        else:
+            results[path] = entry
+    results.update(_map_files(_parse_or_error, misses))
     return results
 
+def shared_ast_cache(paths):
+    """
+    build_ast_cache, but concurrent callers asking for the same files share a single build.
+
+    The dependency and AST crew tasks run at the same time over the same tree; whichever asks first
+    parses, the other waits for its result instead of starting a second process pool.
+    """
+    key = frozenset(os.path.abspath(path) for path in paths)
+    with _AST_CACHE_LOCK:
+        future = _AST_CACHE_BUILDS.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _AST_CACHE_BUILDS[key] = future
+
+    if owner:
+        try:
+            future.set_result(build_ast_cache(paths))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            # Waiters already hold the future; later calls rebuild from the on-disk cache.
+            with _AST_CACHE_LOCK:
+                del _AST_CACHE_BUILDS[key]
+    return future.result()
+
+def analyze_repo(repo_path, index=None):
+    if index is None:
+        index = scan_project(repo_path)
+
+    results = []
+    for file_path, entry in shared_ast_cache(index["py"]).items():
+        results.extend(_group_usages(os.path.normpath(file_path), entry))
+    return results
+
+@functools.lru_cache(maxsize=100_000)
 def safe_text(text):
     return str(text).replace('\t', '    ').encode("latin-1", errors="replace").decode("latin-1")
 
-def load_dependency_versions_with_resolution(csv_path):
-    dep_df = pd.read_csv(csv_path)
+def _normalize_dist_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def installed_versions():
+    """Map normalized distribution names, and the top-level import names they provide, to installed versions."""
+    installed = {}
+    for dist in importlib.metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            installed.setdefault(_normalize_dist_name(name), dist.version)
+    for import_name, dist_names in importlib.metadata.packages_distributions().items():
+        for dist_name in dist_names:
+            version = installed.get(_normalize_dist_name(dist_name))
+            if version:
+                installed.setdefault(_normalize_dist_name(import_name), version)
+                break
+    return installed
+
+def resolve_dependency_versions(dependencies, installed):
+    """Map each (source, package, version) row to a version, falling back to the installed one when unpinned."""
     resolved_versions = {}
-    for _, row in dep_df.iterrows():
-        package = row["Package"]
-        version = str(row["Version"]).strip().lower()
+    for _, package, version in dependencies:
+        version = (version or "").strip().lower()
         if version in ["latest", "python", ""]:
-            try:
-                resolved_versions[package] = importlib.metadata.version(package)
-            except importlib.metadata.PackageNotFoundError:
-                resolved_versions[package] = "latest"
+            resolved_versions[package] = installed.get(_normalize_dist_name(package), "latest")
         else:
             resolved_versions[package] = version
     return resolved_versions
 
-def generate_pdf_report(results, project_path, output_file="ast_report.pdf"):
-    dependency_versions = load_dependency_versions_with_resolution(
-        os.path.join(project_path, "all_dependencies_with_paths.csv")
-    )
+def generate_pdf_report(results, project_path, output_file="ast_report.pdf", index=None):
+    # Imported here because dependency_tools imports this module. Versions come straight from the
+    # manifests rather than the dependency task's CSV, so the two crew tasks can run concurrently.
+    from c.tools.dependency_tools import extract_manifest_dependencies
+
+    if index is None:
+        index = scan_project(project_path)
+    installed = installed_versions()
+    dependency_versions = resolve_dependency_versions(extract_manifest_dependencies(index), installed)
 
     pdf = FPDF()
     pdf.add_page()
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "SCA Report", ln=True)
-    pdf.set_font("Arial", '', 11)
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(0, 10, "SCA Report", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", '', 11)
     pdf.multi_cell(0, 7, "Static analysis of Python imports and their usage.")
     pdf.ln(5)
 
     count = 1
-    i = 0
-    while i < len(results):
-        item = results[i]
-        if item["type"] == "import":
-            pdf.set_font("Arial", 'B', 11)
-            pdf.set_text_color(0, 0, 255)
-            symbol = safe_text(item['symbol'])
-            alias = safe_text(item['alias'])
-            package = symbol.split('.')[0]
-            version = dependency_versions.get(package, "unknown")
-            pdf.cell(0, 7, f"{count}. {symbol} (version: {version})", ln=True)
-
-            pdf.set_font("Arial", '', 10)
-            pdf.set_text_color(0, 0, 0)
-            path = safe_text(item['file']).replace("\\", "/")
-            pdf.cell(0, 6, f"File Path: {path}", ln=True)
-            pdf.cell(0, 6, f"Type: IMPORT", ln=True)
-            pdf.cell(0, 6, f"Line: {item['lineno']}", ln=True)
-            pdf.cell(0, 6, f"Code: {safe_text(item['code'])}", ln=True)
-            pdf.ln(1)
-
-            j = i + 1
-            usage_count = 0
-            while j < len(results) and results[j]["type"] == "usage" and results[j]["alias"] == item["alias"]:
-                usage = results[j]
-                if usage_count == 0:
-                    pdf.set_font("Arial", 'B', 10)
-                    pdf.cell(0, 6, f"USAGE", ln=True)
-                    usage_count += 1
-                pdf.set_font("Arial", '', 10)
-                pdf.cell(0, 6, f"Line: {usage['lineno']}", ln=True)
-                pdf.cell(0, 6, f"Code: {safe_text(usage['code'])}", ln=True)
-                pdf.ln(1)
-                j += 1
-            pdf.ln(2)
-            i = j
-            count += 1
-        else:
-            i += 1
+    for item in results:
+        if "error" in item:
+            continue
+        imp = item["import"]
+        pdf.set_font("Helvetica", 'B', 11)
+        pdf.set_text_color(0, 0, 255)
+        symbol = safe_text(imp['symbol'])
+        package = symbol.split('.')[0]
+        version = dependency_versions.get(package) or installed.get(_normalize_dist_name(package), "unknown")
+        pdf.cell(0, 7, f"{count}. {symbol} (version: {version})", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        pdf.set_font("Helvetica", '', 10)
+        pdf.set_text_color(0, 0, 0)
+        path = safe_text(item['file']).replace("\\", "/")
+        header = f"File Path: {path}\nType: IMPORT\nLine: {imp['lineno']}\nCode: {safe_text(imp['code'])}"
+        pdf.multi_cell(0, 6, header, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.ln(1)
+
+        usages = item["usages"]
+        if usages:
+            pdf.set_font("Helvetica", 'B', 10)
+            pdf.cell(0, 6, "USAGE", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            # One multi_cell per import block instead of two cells per usage line.
+            block = "\n".join(f"Line: {usage['lineno']}\nCode: {safe_text(usage['code'])}" for usage in usages)
+            pdf.set_font("Helvetica", '', 10)
+            pdf.multi_cell(0, 6, block, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.ln(2)
+        count += 1
 
     pdf.output(output_file)
     return output_file
@@ -205,11 +450,12 @@ def generate_ast_usage_pdf(project_path: str) -> str:
         print(f"\U0001F50D Scanning project: {project_path}")
         if not os.path.exists(project_path):
             raise FileNotFoundError(f"Project path does not exist: {project_path}")
-        results = analyze_repo(project_path)
+        index = scan_project(project_path)
+        results = analyze_repo(project_path, index)
         if not results:
             raise ValueError("No Python files or analysis results found in the project path.")
         output_pdf = os.path.join(project_path, "ast_report.pdf")
-        generate_pdf_report(results, project_path, output_pdf)
+        generate_pdf_report(results, project_path, output_pdf, index)
         if not os.path.exists(output_pdf):
             raise IOError("PDF file was not created.")
         print(f"\u2705 PDF generated: {output_pdf}")
@@ -1,15 +1,33 @@
 import os
-import pandas as pd
-import tomli as toml
+import csv
 import re
 import ast
 import yaml
 import sys
+import functools
 import importlib.util
 from crewai.tools import tool
+from c.tools.analyze_python_ast import shared_ast_cache
+from c.tools.project_scan import scan_project
 
+if sys.version_info >= (3, 11):
+    import tomllib as toml
+else:
+    import tomli as toml
+
+_STDLIB_MODULES = frozenset(sys.stdlib_module_names) | frozenset(sys.builtin_module_names)
+_IMPORT_PATTERN = re.compile(rb"^\s*(?:import|from)\s+([\w\d_\.]+)", re.MULTILINE)
+_DEPENDENCY_PATTERN = re.compile(r"([\w\-\.]+)(?:\[[^\]]+\])?\s*(==|>=|<=|>|<|~=)?\s*([\d\w\.\*]+)?")
+
+@functools.lru_cache(maxsize=None)
 def is_builtin_module(module_name):
-    return module_name in sys.builtin_module_names or importlib.util.find_spec(module_name) is None
+    if module_name in _STDLIB_MODULES:
+        return True
+    try:
+        return importlib.util.find_spec(module_name) is None
+    except (ImportError, ValueError):
+        # e.g. "__main__", whose spec is unset when not run via -m
+        return True
 
 def split_dependency(dep):
     dep = dep.strip()
@@ -22,7 +40,7 @@ def split_dependency(dep):
         package, version = map(str.strip, dep.split("@", 1))
         return package, f"@ {version}"
 
-    match = re.match(r"([\w\-\.]+)(?:\[[^\]]+\])?\s*(==|>=|<=|>|<|~=)?\s*([\d\w\.\*]+)?", dep)
+    match = _DEPENDENCY_PATTERN.match(dep)
     if match:
         package = match.group(1)
         version_operator = match.group(2) or ""
@@ -50,7 +68,8 @@ def parse_setup_py(file_path):
 def extract_pipfile_dependencies(pipfile_path):
     dependencies = []
     try:
-        pipfile_data = toml.load(pipfile_path)
+        with open(pipfile_path, "rb") as f:
+            pipfile_data = toml.load(f)
 
         if "requires" in pipfile_data:
             python_version = pipfile_data["requires"].get("python_version")
@@ -71,7 +90,7 @@ def extract_pipfile_dependencies(pipfile_path):
 def extract_pyproject_dependencies(pyproject_path):
     dependencies = []
 
-    with open(pyproject_path, 'r', encoding='utf-8') as f:
+    with open(pyproject_path, "rb") as f:
         pyproject_data = toml.load(f)
 
     # ✅ Existing PEP 621 / Poetry standard checks
@@ -104,7 +123,7 @@ def extract_pyproject_dependencies(pyproject_path):
 def extract_poetry_lock_dependencies(poetry_lock_path):
     dependencies = []
     try:
-        with open(poetry_lock_path, "r", encoding="utf-8") as file:
+        with open(poetry_lock_path, "rb") as file:
             poetry_lock_data = toml.load(file)
         for package in poetry_lock_data.get("package", []):
             name = package.get("name", "")
@@ -152,45 +171,48 @@ def get_pip_dependencies(requirements_file):
         print(f"Error reading requirements.txt {requirements_file}: {e}")
     return dependencies
 
-def extract_python_file_dependencies(project_path, python_version):
-    dependencies = set()
-    pattern = re.compile(r"^\s*(?:import|from)\s+([\w\d_\.]+)")
-    for root, _, files in os.walk(project_path):
-        for file in files:
-            if file.endswith(".py"):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        for line in f:
-                            match = pattern.match(line)
-                            if match:
-                                module = match.group(1).split(".")[0]
-                                if not is_builtin_module(module):
-                                    dependencies.add((file_path, module, python_version))
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
-    return list(dependencies)
-
-def find_all_files(root_path, filename):
-    matches = []
-    for root, _, files in os.walk(root_path):
-        for f in files:
-            if f.lower() == filename.lower():
-                matches.append(os.path.join(root, f))
+def _scan_imports_with_regex(file_path, python_version, dependencies):
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        for match in _IMPORT_PATTERN.finditer(data):
+            module = match.group(1).decode().split(".")[0]
+            if not is_builtin_module(module):
+                dependencies.add((file_path, module, python_version))
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
 
-    return matches
+def extract_python_file_dependencies(project_path, python_version, ast_cache=None, index=None):
+    """
+    Collect third-party imports from Python sources.
 
-@tool
-def extract_project_dependencies(project_path: str) -> str:
+    Imports are taken from the same (imports, usage) records analyze_repo produces, via
+    shared_ast_cache: files already parsed by the AST tool come from the on-disk cache, and a
+    concurrent AST build is joined rather than repeated. Files that fail to parse fall back to a
+    regex line scan.
     """
-    Extract dependencies from all common dependency files and source code within a Python project directory.
+    if ast_cache is None:
+        if index is None:
+            index = scan_project(project_path)
+        ast_cache = shared_ast_cache(index["py"])
 
-    Args:
-        project_path (str): The root path of the Python project.
+    dependencies = set()
+    for file_path, entry in ast_cache.items():
+        if isinstance(entry, str):
+            _scan_imports_with_regex(file_path, python_version, dependencies)
+            continue
+        imports, _ = entry
+        for imp in imports:
+            # Relative imports point back into the project itself.
+            if imp.level:
+                continue
+            module = imp.module.split(".")[0]
+            if not is_builtin_module(module):
+                dependencies.add((file_path, module, python_version))
+    return list(dependencies)
 
-    Returns:
-        str: Path to the generated CSV file containing all dependencies.
-    """
+def extract_manifest_dependencies(index):
+    """Run every dependency-file extractor over the manifests found by scan_project."""
     dependency_files = {
         "pyproject.toml": extract_pyproject_dependencies,
         "poetry.lock": extract_poetry_lock_dependencies,
@@ -200,20 +222,34 @@ def extract_project_dependencies(project_path: str) -> str:
         "setup.py": parse_setup_py,
     }
 
-    all_dependencies = []
-
+    dependencies = []
     for filename, extractor in dependency_files.items():
-        file_paths = find_all_files(project_path, filename)
-        for file_path in file_paths:
+        for file_path in index[filename]:
             try:
-                all_dependencies.extend(extractor(file_path))
+                dependencies.extend(extractor(file_path))
             except Exception as e:
                 print(f"Error extracting from {file_path}: {e}")
+    return dependencies
+
+@tool
+def extract_project_dependencies(project_path: str) -> str:
+    """
+    Extract dependencies from all common dependency files and source code within a Python project directory.
+
+    Args:
+        project_path (str): The root path of the Python project.
 
-    all_dependencies.extend(extract_python_file_dependencies(project_path, "latest"))
+    Returns:
+        str: Path to the generated CSV file containing all dependencies.
+    """
+    index = scan_project(project_path)
+    all_dependencies = extract_manifest_dependencies(index)
+    all_dependencies.extend(extract_python_file_dependencies(project_path, "latest", index=index))
 
     csv_file = os.path.join(project_path, "all_dependencies_with_paths.csv")
-    df = pd.DataFrame(all_dependencies, columns=["Source Path", "Package", "Version"])
-    df.to_csv(csv_file, index=False)
+    with open(csv_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Source Path", "Package", "Version"])
+        writer.writerows(all_dependencies)
 
     return f"Dependencies extracted and saved to {csv_file}"
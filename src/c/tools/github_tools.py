@@ -1,13 +1,144 @@
 import os
+import re
+import json
+import time
+import asyncio
+import inspect
 from crewai.tools import tool
 
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+try:
+    import pygit2
+except ImportError:  # optional: fall back to the git CLI
+    pygit2 = None
+
+# clone_repository only takes depth in recent pygit2 releases; older ones clone through the git CLI instead.
+_PYGIT2_SHALLOW_CLONE = pygit2 is not None and "depth" in inspect.signature(pygit2.clone_repository).parameters
 
 GITHUB_TOKEN =os.getenv("GITHUB_TOKEN")
+GITHUB_HEADERS = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github+json"}
+GITHUB_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "c-github")
+# Repo listings younger than this (seconds) are served without contacting GitHub at all.
+GITHUB_CACHE_TTL = int(os.getenv("GITHUB_CACHE_TTL", "300"))
+# One pooled session so repeated API calls reuse the same keep-alive TLS connection.
+_SESSION = requests.Session()
+_SESSION.headers.update(GITHUB_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+_LAST_PAGE_PATTERN = re.compile(r'<[^>]*[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+
+def _last_page(link_header: Optional[str]) -> int:
+    """Read the last page number from a GitHub `Link` header (1 when there is only one page)."""
+    match = _LAST_PAGE_PATTERN.search(link_header or "")
+    return int(match.group(1)) if match else 1
+
+
+def _repo_summary(repo: Dict) -> Dict:
+    return {
+        "name": repo['name'],
+        "language": repo.get('language', 'Unknown'),
+        "stars": repo['stargazers_count'],
+        "forks": repo['forks_count'],
+        "watchers": repo['watchers_count'],
+        "updated_at": repo['updated_at'],
+        "private": repo['private'],
+        "clone_url": repo['clone_url'],
+        "ssh_url": repo['ssh_url'],
+        "default_branch": repo.get('default_branch')
+    }
+
+
+def _cache_file(*parts: str) -> str:
+    return os.path.join(GITHUB_CACHE_DIR, *parts[:-1], f"{parts[-1]}.json")
+
+
+def _read_cache(path: str) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(path: str, payload: Dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[!] Could not write GitHub cache {path}: {e}")
+
+
+async def _fetch_all(account: str) -> List[Dict]:
+    cache_path = _cache_file("accounts", account)
+    cache = _read_cache(cache_path)
+    if cache and time.time() - cache.get("fetched_at", 0) < GITHUB_CACHE_TTL:
+        return [repo for page in cache["pages"].values() for repo in page["data"]]
+
+    connector = aiohttp.TCPConnector(limit=16)
+
+    async with aiohttp.ClientSession(headers=GITHUB_HEADERS, connector=connector) as session:
+        # Check if the account is an organization
+        async with session.get(f"https://api.github.com/orgs/{account}") as org_response:
+            is_org = org_response.status == 200
+
+        if is_org:
+            # Organization: fetch both public & private repos (if accessible)
+            api_url = f"https://api.github.com/orgs/{account}/repos"
+            base_params = {"type": "all", "per_page": 100}
+        else:
+            # User: fetch all repos (including private ones if authenticated)
+            api_url = "https://api.github.com/user/repos"
+            base_params = {"per_page": 100}
+
+        cached_pages = cache.get("pages", {}) if cache.get("api_url") == api_url else {}
+
+        async def fetch_page(page):
+            # Revalidate with the page's ETag: a 304 is cheap and does not count against the rate limit.
+            cached = cached_pages.get(str(page))
+            page_headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+            async with session.get(api_url, params={**base_params, "page": page}, headers=page_headers) as response:
+                if response.status == 304:
+                    return 200, cached
+                data = await response.json(content_type=None)
+                if response.status != 200:
+                    return response.status, data
+                return 200, {
+                    "etag": response.headers.get("ETag"),
+                    "link": response.headers.get("Link"),
+                    "data": [_repo_summary(repo) for repo in data],
+                }
+
+        # Page 1 tells us how many pages there are; the rest are fetched concurrently.
+        first = await fetch_page(1)
+        pages = [first]
+        if first[0] == 200:
+            last_page = _last_page(first[1]["link"])
+            pages += await asyncio.gather(*(fetch_page(page) for page in range(2, last_page + 1)))
+
+    for status, payload in pages:
+        if status != 200:
+            return [{"error": payload.get("message", "Unknown error")}]
+
+    _write_cache(cache_path, {
+        "api_url": api_url,
+        "fetched_at": time.time(),
+        "pages": {str(number): payload for number, (_, payload) in enumerate(pages, start=1)},
+    })
+    return [repo for _, payload in pages for repo in payload["data"]]
+
+
 @tool
 def get_github_repos_tool(account: str) -> List[Dict]:
     """Useful for fetching public & private repositories from a GitHub user or organization.
@@ -15,80 +146,97 @@ def get_github_repos_tool(account: str) -> List[Dict]:
     Args:
         account (str): GitHub username or organization name
     """
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    
-    # Check if the account is an organization
-    org_api = f"https://api.github.com/orgs/{account}"
-    org_response = requests.get(org_api, headers=headers)
-    
-    if org_response.status_code == 200:
-        # Organization: fetch both public & private repos (if accessible)
-        api_url = f"https://api.github.com/orgs/{account}/repos?type=all"
-    else:
-        # User: fetch all repos (including private ones if authenticated)
-        api_url = "https://api.github.com/user/repos"
+    return asyncio.run(_fetch_all(account))
 
-    repos = []
-    page = 1
-    while True:
-        response = requests.get(api_url, headers=headers, params={"page": page, "per_page": 100})
-        
-        if response.status_code != 200:
-            return [{"error": response.json().get("message", "Unknown error")}]
-        
-        data = response.json()
-        if not data:
-            break
-        
-        for repo in data:
-            repo_info = {
-                "name": repo['name'],
-                "language": repo.get('language', 'Unknown'),
-                "stars": repo['stargazers_count'],
-                "forks": repo['forks_count'],
-                "watchers": repo['watchers_count'],
-                "updated_at": repo['updated_at'],
-                "private": repo['private'],
-                "clone_url": repo['clone_url'],
-                "ssh_url": repo['ssh_url']
-            }
-            repos.append(repo_info)
-        
-        page += 1
-    
-    return repos
-
-@tool
-def clone_github_repo_tool(repo: Dict, destination_folder: str, github_account: str) -> str:
-    """Useful for cloning a GitHub repository (public or private).
-    
-    Args:
-        repo (Dict): Repository information dictionary
-        destination_folder (str): Local directory path where to clone the repository
-        github_account (str): GitHub username or organization name
-    """
+def _clone_repo(repo: Dict, destination_folder: str, github_account: str) -> str:
     os.makedirs(destination_folder, exist_ok=True)
     clone_path = os.path.join(destination_folder, repo["name"])
     
     if os.path.exists(clone_path):
         return f"✅ Repository '{repo['name']}' already exists at {clone_path}"
     
+    # The pygit2 path needs the branch name to restrict the fetch; older cached listings lack it.
+    if _PYGIT2_SHALLOW_CLONE and repo.get("default_branch"):
+        return _clone_with_pygit2(repo, clone_path, github_account)
+    return _clone_with_git(repo, clone_path, github_account)
+
+def _clone_with_pygit2(repo: Dict, clone_path: str, github_account: str) -> str:
+    # libgit2 clones in-process (no git fork/exec per repo) and releases the GIL during network I/O.
+    callbacks = None
+    if repo['private']:
+        repo_url = f"https://github.com/{github_account}/{repo['name']}.git"
+        callbacks = pygit2.RemoteCallbacks(credentials=pygit2.UserPass(GITHUB_TOKEN, "x-oauth-basic"))
+    else:
+        repo_url = repo["clone_url"]
+
+    # libgit2's default refspec fetches every branch head; only fetch the default one, like --single-branch.
+    branch = repo["default_branch"]
+    refspec = f"+refs/heads/{branch}:refs/remotes/origin/{branch}"
+
+    def create_remote(repository, name, url):
+        return repository.remotes.create(name, url, refspec)
+
+    try:
+        pygit2.clone_repository(
+            repo_url, clone_path, depth=1, callbacks=callbacks, remote=create_remote, checkout_branch=branch
+        )
+        return f"✅ Successfully cloned {repo['name']} into {clone_path}"
+    except (pygit2.GitError, ValueError) as e:
+        # Don't leave a partial checkout behind, or the next attempt reports it as already cloned.
+        shutil.rmtree(clone_path, ignore_errors=True)
+        return f"❌ Failed to clone {repo['name']}: {e}"
+    except Exception:
+        shutil.rmtree(clone_path, ignore_errors=True)
+        raise
+
+def _clone_with_git(repo: Dict, clone_path: str, github_account: str) -> str:
     # Use HTTPS authentication for private repos
     if repo['private']:
         repo_url = f"https://{GITHUB_TOKEN}@github.com/{github_account}/{repo['name']}.git"
     else:
         repo_url = repo["clone_url"]
 
+    # Static analysis only needs the tree at HEAD, so skip history and lazily fetch blobs.
+    # stdout is discarded; stderr is kept (it is tiny without a tty) for the failure message.
     try:
-        result = subprocess.run(
-            ["git", "clone", repo_url, clone_path],
-            capture_output=True,
+        subprocess.run(
+            ["git", "clone", "--depth", "1", "--filter=blob:none", "--single-branch", repo_url, clone_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             text=True,
             check=True
         )
         return f"✅ Successfully cloned {repo['name']} into {clone_path}"
     except subprocess.CalledProcessError as e:
-        return f"❌ Failed to clone {repo['name']}: {e.stderr or e.stdout}"
+        return f"❌ Failed to clone {repo['name']}: {e.stderr}"
+
+def clone_many(repos: List[Dict], destination_folder: str, github_account: str, max_workers: int = 8) -> List[str]:
+    """Clone several repositories concurrently; returns one status message per repo, in input order."""
+    os.makedirs(destination_folder, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda repo: _clone_repo(repo, destination_folder, github_account), repos))
+
+@tool
+def clone_github_repo_tool(repo: Dict, destination_folder: str, github_account: str) -> str:
+    """Useful for cloning a GitHub repository (public or private).
+    
+    Args:
+        repo (Dict): Repository information dictionary
+        destination_folder (str): Local directory path where to clone the repository
+        github_account (str): GitHub username or organization name
+    """
+    return _clone_repo(repo, destination_folder, github_account)
+
+@tool
+def clone_github_repos_tool(repos: List[Dict], destination_folder: str, github_account: str) -> List[str]:
+    """Useful for cloning many GitHub repositories (public or private) at once, in parallel.
+    
+    Args:
+        repos (List[Dict]): Repository information dictionaries, as returned by get_github_repos_tool
+        destination_folder (str): Local directory path where to clone the repositories
+        github_account (str): GitHub username or organization name
+    """
+    return clone_many(repos, destination_folder, github_account)
 
 @tool
 def get_repo_info_tool(repo_url: str) -> Dict:
@@ -97,8 +245,6 @@ def get_repo_info_tool(repo_url: str) -> Dict:
     Args:
         repo_url (str): The full URL of the GitHub repository
     """
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    
     # Parse the GitHub URL
     parsed = urlparse(repo_url)
     if not parsed.netloc == 'github.com':
@@ -111,23 +257,20 @@ def get_repo_info_tool(repo_url: str) -> Dict:
     owner, repo_name = path_parts[0], path_parts[1].replace('.git', '')
     api_url = f"https://api.github.com/repos/{owner}/{repo_name}"
     
+    cache_path = _cache_file("repos", owner, repo_name)
+    cache = _read_cache(cache_path)
+    headers = {"If-None-Match": cache["etag"]} if cache.get("etag") else {}
+    
     try:
-        response = requests.get(api_url, headers=headers)
+        response = _SESSION.get(api_url, headers=headers)
+        if response.status_code == 304:
+            return cache["data"]
         response.raise_for_status()
         repo = response.json()
         
-        return {
-            "name": repo['name'],
-            "language": repo.get('language', 'Unknown'),
-            "stars": repo['stargazers_count'],
-            "forks": repo['forks_count'],
-            "watchers": repo['watchers_count'],
-            "updated_at": repo['updated_at'],
-            "private": repo['private'],
-            "clone_url": repo['clone_url'],
-            "ssh_url": repo['ssh_url'],
-            "owner": owner
-        }
+        info = {**_repo_summary(repo), "owner": owner}
+        _write_cache(cache_path, {"etag": response.headers.get("ETag"), "data": info})
+        return info
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
@@ -135,8 +278,16 @@ def cache_repo_clone(args: dict, result: str) -> bool:
     """Determine whether to cache the clone operation result."""
     return "Successfully" in result
 
+def cache_github_response(args: dict, result) -> bool:
+    """Determine whether to cache a GitHub API lookup (anything but an error result)."""
+    if isinstance(result, dict):
+        return "error" not in result
+    return not any("error" in item for item in result)
+
 # Add caching function to clone_github_repo_tool
 clone_github_repo_tool.cache_function = cache_repo_clone
+get_github_repos_tool.cache_function = cache_github_response
+get_repo_info_tool.cache_function = cache_github_response
 
 # Export tools
-__all__ = ['get_github_repos_tool', 'clone_github_repo_tool', 'get_repo_info_tool']
\ No newline at end of file
+__all__ = ['get_github_repos_tool', 'clone_github_repo_tool', 'clone_github_repos_tool', 'get_repo_info_tool']
\ No newline at end of file
@@ -0,0 +1,75 @@
+import os
+
+DEPENDENCY_FILES = (
+    "pyproject.toml",
+    "poetry.lock",
+    "Pipfile",
+    "environment.yml",
+    "requirements.txt",
+    "setup.py",
+)
+
+_DEPENDENCY_FILES_BY_LOWER = {name.lower(): name for name in DEPENDENCY_FILES}
+
+# Directories that never hold project sources; add to this set to prune more.
+SKIP_DIRS = {
+    ".git",
+    "node_modules",
+    "__pycache__",
+    ".tox",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".eggs",
+}
+
+def _is_virtualenv(path):
+    return os.path.isfile(os.path.join(path, "pyvenv.cfg"))
+
+def _is_not_package(path):
+    return not os.path.isfile(os.path.join(path, "__init__.py"))
+
+# Names that real packages use too (the stdlib ships venv/, pip has an operations/build/ package), so these
+# are only pruned when the check passes: an actual virtualenv, or build output rather than a package.
+SKIP_DIRS_IF = {
+    ".venv": _is_virtualenv,
+    "venv": _is_virtualenv,
+    "build": _is_not_package,
+    "dist": _is_not_package,
+}
+
+def scan_project(root, skip_dirs=None):
+    """
+    Walk a project tree once and bucket the files every tool cares about.
+
+    Returns a dict with a "py" list of Python sources plus one list per name in DEPENDENCY_FILES
+    (matched case-insensitively, like the per-file lookups it replaces). Directories named in
+    skip_dirs (SKIP_DIRS by default) are not descended into, nor are those whose SKIP_DIRS_IF check passes.
+    """
+    if skip_dirs is None:
+        skip_dirs = SKIP_DIRS
+    index = {"py": []}
+    index.update({name: [] for name in DEPENDENCY_FILES})
+
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    # Same as os.walk: list symlinked dirs but do not descend into them.
+                    if entry.is_dir():
+                        if entry.name in skip_dirs or entry.is_symlink():
+                            continue
+                        check = SKIP_DIRS_IF.get(entry.name)
+                        if check is None or not check(entry.path):
+                            stack.append(entry.path)
+                        continue
+                    name = entry.name
+                    if name.endswith(".py"):
+                        index["py"].append(entry.path)
+                    key = _DEPENDENCY_FILES_BY_LOWER.get(name.lower())
+                    if key:
+                        index[key].append(entry.path)
+        except OSError as e:
+            print(f"[!] Could not scan {current}: {e}")
+    return index